@@ -11,7 +11,8 @@ The "needleman" parameter runs the algorithm as regular needleman-wunsch.
 """
 from enum import IntEnum
 import numpy as np
-from itertools import accumulate
+from itertools import accumulate, chain
+from profiling import count, timed
 
 
 # Assigning the constants for the scores
@@ -109,7 +110,33 @@ def old_smith_waterman(seq1, seq2):
     return aligned_seq1, aligned_seq2
 
 
+class AlignmentCache:
+    """
+    Holds the matrices of the last alignment made with it. A cell only depends on the
+    prefixes of the sequences up to it, so aligning sequences that share prefixes with
+    the last ones (like "beret" and "berets") copies those cells instead of computing
+    them again. Only share a cache between alignments with the same scoring functions
+    and mode, made one after the other - not between threads.
+    """
+
+    def __init__(self):
+        self.seq1 = None
+        self.seq2 = None
+        self.matrix = None
+        self.tracing_matrix = None
+
+
+def common_prefix_length(first, second) -> int:
+    length = 0
+    for first_element, second_element in zip(first, second):
+        if first_element != second_element:
+            break
+        length += 1
+    return length
+
+
 # Implementing the Smith Waterman local alignment
+@timed("smith_waterman")
 def smith_waterman(
     similarity,
     skippability,
@@ -117,70 +144,103 @@ def smith_waterman(
     seq2,
     build_empty_element=lambda: [],
     needleman=False,
+    cache=None,
 ):
     # Generating the empty matrices for storing scores and tracing
     row = len(seq1) + 1
     col = len(seq2) + 1
-    matrix = np.zeros(shape=(row, col), dtype=int)
-    tracing_matrix = np.zeros(shape=(row, col), dtype=int)
+    # Read once, so that the cache is only looked at as it was when the call started:
+    (cached_seq1, cached_seq2, cached_matrix, cached_tracing_matrix) = (
+        (cache.seq1, cache.seq2, cache.matrix, cache.tracing_matrix)
+        if cache is not None
+        else (None, None, None, None)
+    )
+    if cached_matrix is not None:
+        shared1 = common_prefix_length(cached_seq1, seq1)
+        shared2 = common_prefix_length(cached_seq2, seq2)
+    else:
+        shared1 = shared2 = 0
+    count("smith_waterman.cells", (row - 1) * (col - 1) - shared1 * shared2)
+    count("smith_waterman.cells_reused", shared1 * shared2)
+    # Plain lists rather than numpy arrays - the cells are filled one at a time, and
+    # indexing numpy arrays element by element is much slower:
+    matrix = [[0] * col for _ in range(row)]
+    tracing_matrix = [[Trace.STOP] * col for _ in range(row)]
+    skippabilities1 = [skippability(element) for element in seq1]
+    skippabilities2 = [skippability(element) for element in seq2]
 
     if needleman:
-        matrix[:, 0] = list(
+        for i, value in enumerate(
             accumulate(
-                seq1,
-                lambda accumulated, new: accumulated - skippability(new),
+                skippabilities1,
+                lambda accumulated, skipped: accumulated - skipped,
                 initial=0,
             )
-        )
-        tracing_matrix[:, 0] = [0] + [Trace.UP] * (row - 1)
+        ):
+            matrix[i][0] = value
+            tracing_matrix[i][0] = Trace.UP if i else Trace.STOP
 
-        matrix[0, :] = list(
+        matrix[0] = list(
             accumulate(
-                seq2,
-                lambda accumulated, new: accumulated - skippability(new),
+                skippabilities2,
+                lambda accumulated, skipped: accumulated - skipped,
                 initial=0,
             )
         )
-        tracing_matrix[0, :] = [0] + [Trace.LEFT] * (col - 1)
-
-    # Initialising the variables to find the highest scoring cell
-    max_score = float("-inf")
-    max_index = (-1, -1)
+        tracing_matrix[0] = [Trace.STOP] + [Trace.LEFT] * (col - 1)
 
     # Calculating the scores for all cells in the matrix
     for i in range(1, row):
-        for j in range(1, col):
+        previous_scores = matrix[i - 1]
+        scores = matrix[i]
+        traces = tracing_matrix[i]
+        element1 = seq1[i - 1]
+        skippability1 = skippabilities1[i - 1]
+        first_j = 1
+        if i <= shared1 and shared2:
+            # These cells only depend on the prefixes shared with the cached alignment
+            scores[1 : shared2 + 1] = cached_matrix[i][1 : shared2 + 1]
+            traces[1 : shared2 + 1] = cached_tracing_matrix[i][1 : shared2 + 1]
+            first_j = shared2 + 1
+        for j in range(first_j, col):
             # Calculating the diagonal score (match score)
-            match_value = similarity(seq1[i - 1], seq2[j - 1])
-
-            diagonal_score = matrix[i - 1, j - 1] + match_value
+            diagonal_score = previous_scores[j - 1] + similarity(element1, seq2[j - 1])
 
             # Calculating the vertical gap score
-            vertical_score = matrix[i - 1, j] - skippability(seq1[i - 1])  # - 1
+            vertical_score = previous_scores[j] - skippability1
 
             # Calculating the horizontal gap score
-            horizontal_score = matrix[i, j - 1] - skippability(seq2[j - 1])  # - 1
+            horizontal_score = scores[j - 1] - skippabilities2[j - 1]
 
             # Taking the highest score
-            matrix[i, j] = max(diagonal_score, vertical_score, horizontal_score)
+            score = max(diagonal_score, vertical_score, horizontal_score)
+            scores[j] = score
 
-            if matrix[i, j] == horizontal_score:
-                tracing_matrix[i, j] = Trace.LEFT
+            if score == horizontal_score:
+                traces[j] = Trace.LEFT
 
-            elif matrix[i, j] == vertical_score:
-                tracing_matrix[i, j] = Trace.UP
+            elif score == vertical_score:
+                traces[j] = Trace.UP
 
-            elif matrix[i, j] == diagonal_score:
-                tracing_matrix[i, j] = Trace.DIAGONAL
+            else:
+                traces[j] = Trace.DIAGONAL
 
-            # Tracking the cell with the maximum score
-            if (
-                not needleman
-                and matrix[i, j] >= max_score
-                and (i == row - 1 or j == col - 1)
-            ):
+    if cache is not None:
+        (cache.seq1, cache.seq2) = (seq1, seq2)
+        (cache.matrix, cache.tracing_matrix) = (matrix, tracing_matrix)
+
+    # Finding the highest scoring cell in which one of the words is completed, the
+    # last one of them in row-major order
+    max_score = float("-inf")
+    max_index = (-1, -1)
+    if not needleman and row > 1 and col > 1:
+        for (i, j) in chain(
+            ((i, col - 1) for i in range(1, row - 1)),
+            ((row - 1, j) for j in range(1, col)),
+        ):
+            if matrix[i][j] >= max_score:
                 max_index = (i, j)
-                max_score = matrix[i, j]
+                max_score = matrix[i][j]
 
     # Initialising the variables for tracing
     aligned_seq1 = []
@@ -200,18 +260,18 @@ def smith_waterman(
         loop_condition = lambda i, j: i * j > 0
 
     while loop_condition(max_i, max_j):
-        if tracing_matrix[max_i, max_j] == Trace.DIAGONAL:
+        if tracing_matrix[max_i][max_j] == Trace.DIAGONAL:
             current_aligned_seq1 = seq1[max_i - 1]
             current_aligned_seq2 = seq2[max_j - 1]
             max_i = max_i - 1
             max_j = max_j - 1
 
-        elif tracing_matrix[max_i, max_j] == Trace.UP:
+        elif tracing_matrix[max_i][max_j] == Trace.UP:
             current_aligned_seq1 = seq1[max_i - 1]
             current_aligned_seq2 = build_empty_element()
             max_i = max_i - 1
 
-        elif tracing_matrix[max_i, max_j] == Trace.LEFT:
+        elif tracing_matrix[max_i][max_j] == Trace.LEFT:
             current_aligned_seq1 = build_empty_element()
             current_aligned_seq2 = seq2[max_j - 1]
             max_j = max_j - 1
@@ -0,0 +1,493 @@
+"""
+Resumable batch runs of `analyze_groups` over long lists of seed pairs. The jobs are
+split into shards, which are processed by local worker processes - or by several
+machines running the same batch in a shared directory. Everything lives in the
+directory:
+
+    manifest.json       What the batch is (written once, when the batch starts)
+    shard-00000.json    The results and timings of a finished shard
+    shard-00000.lock    The shard is being processed (by the host and pid inside)
+
+Files are written atomically, and a shard is done exactly when its results file
+exists, so a crashed batch resumes by running it again - only the unfinished shards
+are processed.
+
+    python batch.py runs/nightly --seeds seeds.txt --workers 8
+"""
+from __future__ import annotations
+from typing import (
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+    Union,
+)
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import argparse
+import json
+import os
+import socket
+import sys
+import time
+
+import matches
+from matches.match import MatchType, analyze_groups
+from puntomatic import neighbours as model_neighbours
+
+Seed = Union[str, List[str]]
+Job = List[Seed]
+
+MANIFEST = "manifest.json"
+DEFAULTS = {
+    "shard_size": 100,
+    "match_types": ["OrthographicMatch", "PhoneticMatch", "RhymeMatch"],
+    "topn": 100,
+    "collapse_stems": False,
+}
+
+
+def shard_count(manifest: Dict) -> int:
+    return -(-len(manifest["jobs"]) // manifest["shard_size"])
+
+
+def shard_path(directory: str, shard: int, extension: str = "json") -> str:
+    return os.path.join(directory, "shard-{:05d}.{}".format(shard, extension))
+
+
+def _write_json_atomically(path: str, data) -> None:
+    temporary = "{}.{}-{}.tmp".format(path, socket.gethostname(), os.getpid())
+    with open(temporary, "w") as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, path)
+
+
+def _read_json(path: str):
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def _create_lock(path: str, lock: Dict) -> None:
+    """
+    Puts the lock in place, written out in full - raising FileExistsError if there
+    already is one.
+    """
+    temporary = "{}.{}-{}.tmp".format(path, socket.gethostname(), os.getpid())
+    with open(temporary, "w") as f:
+        json.dump(lock, f)
+        f.flush()
+        os.fsync(f.fileno())
+    try:
+        os.link(temporary, path)
+    finally:
+        os.remove(temporary)
+
+
+def _read_lock(path: str) -> Tuple[Optional[Dict], float]:
+    """
+    The lock's contents (None if they can't be parsed) and modification time.
+    """
+    with open(path, "r") as f:
+        modified = os.fstat(f.fileno()).st_mtime
+        try:
+            return (json.load(f), modified)
+        except ValueError:
+            return (None, modified)
+
+
+def _lock_is_stale(
+    lock: Optional[Dict], modified: float, lock_timeout: Optional[float]
+) -> bool:
+    if lock is None:
+        # Left broken by an older version of this module, or a full disk
+        return lock_timeout is not None and time.time() - modified > lock_timeout
+    if lock["host"] != socket.gethostname():
+        # Can't tell whether a process on another machine is still alive
+        return lock_timeout is not None and time.time() - lock["started"] > lock_timeout
+    try:
+        os.kill(lock["pid"], 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass
+    return False
+
+
+def claim_shard(
+    directory: str, shard: int, lock_timeout: Optional[float] = None
+) -> Optional[Dict]:
+    """
+    Takes the shard's lock, returning its contents - or None if another live process
+    holds it. Locks of dead processes on this host, and locks of other hosts (or locks
+    that can't be read) older than `lock_timeout` seconds, are taken over.
+    """
+    path = shard_path(directory, shard, "lock")
+    lock = {"host": socket.gethostname(), "pid": os.getpid(), "started": time.time()}
+    while True:
+        try:
+            _create_lock(path, lock)
+            return lock
+        except FileExistsError:
+            pass
+        try:
+            (stale_lock, modified) = _read_lock(path)
+        except FileNotFoundError:
+            # Released in the meantime
+            continue
+        try:
+            if not _lock_is_stale(stale_lock, modified, lock_timeout):
+                return None
+        except KeyError:
+            # Not a lock of this module
+            return None
+        # Only one process can rename the stale lock away. The one that did retries
+        # the exclusive create, so a stale lock is never taken over twice:
+        aside = "{}.{}-{}.stale".format(path, socket.gethostname(), os.getpid())
+        try:
+            os.rename(path, aside)
+        except FileNotFoundError:
+            return None
+        try:
+            if _read_lock(aside)[0] != stale_lock:
+                # Someone else took the stale lock over in the meantime, and this
+                # moved their new lock aside - so it's put back, unless it can't be
+                try:
+                    os.link(aside, path)
+                except FileExistsError:
+                    pass
+                return None
+        finally:
+            os.remove(aside)
+
+
+def _release_shard(directory: str, shard: int, lock: Dict) -> None:
+    """
+    Removes the shard's lock, unless it was taken over and isn't ours anymore.
+    """
+    path = shard_path(directory, shard, "lock")
+    try:
+        if _read_json(path) != lock:
+            return
+    except (OSError, ValueError):
+        return
+    os.remove(path)
+
+
+def run_shard(
+    directory: str,
+    shard: int,
+    jobs: List[Job],
+    match_types: Sequence[Type[MatchType]],
+    topn: int,
+    collapse_stems: bool = False,
+    neighbours: Callable[[Seed, int], list] = model_neighbours,
+    lock_timeout: Optional[float] = None,
+) -> Optional[Dict]:
+    """
+    Processes the shard and writes its results, returning the shard's timings - or
+    None if it is done already or being processed by someone else.
+    """
+    if os.path.exists(shard_path(directory, shard)):
+        return None
+    lock = claim_shard(directory, shard, lock_timeout)
+    if lock is None:
+        return None
+    # It may have been finished between checking and claiming it:
+    if os.path.exists(shard_path(directory, shard)):
+        _release_shard(directory, shard, lock)
+        return None
+    started = time.time()
+    start = time.perf_counter()
+    results = []
+    errors = 0
+    try:
+        for job in jobs:
+            (first, second) = (job, None)
+            try:
+                # Inside the try, so a malformed job in an older manifest is only
+                # recorded as an error:
+                (first, second) = job
+                found = analyze_groups(
+                    neighbours(first, topn),
+                    neighbours(second, topn),
+                    match_types,
+                    collapse_stems=collapse_stems,
+                )
+            except Exception as error:
+                # Like a seed missing from the model - it would fail again on every
+                # resume, so it's recorded rather than keeping the shard from finishing
+                errors += 1
+                results.append(
+                    {"first": first, "second": second, "error": repr(error)}
+                )
+                continue
+            results.append(
+                {
+                    "first": first,
+                    "second": second,
+                    "matches": {
+                        match_type.__name__: [
+                            [*value, float(priority)] for (value, priority) in matched
+                        ]
+                        for match_type, matched in found.items()
+                    },
+                }
+            )
+    except BaseException:
+        _release_shard(directory, shard, lock)
+        raise
+    timings = {
+        "shard": shard,
+        "jobs": len(jobs),
+        "errors": errors,
+        "seconds": time.perf_counter() - start,
+        "started": started,
+        "host": socket.gethostname(),
+        "pid": os.getpid(),
+    }
+    _write_json_atomically(
+        shard_path(directory, shard), {**timings, "results": results}
+    )
+    _release_shard(directory, shard, lock)
+    return timings
+
+
+def _prepare_manifest(directory: str, batch: Dict) -> Dict:
+    # As it would be read back from the manifest:
+    batch = json.loads(json.dumps(batch))
+    path = os.path.join(directory, MANIFEST)
+    if not os.path.exists(path):
+        if batch["jobs"] is None:
+            raise ValueError(
+                "No jobs given, and no batch to resume in {}.".format(directory)
+            )
+        manifest = {
+            **{key: value for key, value in batch.items() if value is not None},
+            **{key: value for key, value in DEFAULTS.items() if batch[key] is None},
+        }
+        _write_json_atomically(path, manifest)
+        return manifest
+    manifest = _read_json(path)
+    for key, value in batch.items():
+        if value is not None and manifest[key] != value:
+            raise ValueError(
+                "{} already holds a batch with a different {}.".format(directory, key)
+            )
+    return manifest
+
+
+def shard_timings(directory: str, manifest: Dict) -> List[Dict]:
+    """
+    The timings of the finished shards, read from their own files - so that nothing
+    has to be written to a file shared by all the hosts running the batch.
+    """
+    timings = []
+    for shard in range(shard_count(manifest)):
+        path = shard_path(directory, shard)
+        if os.path.exists(path):
+            finished = _read_json(path)
+            del finished["results"]
+            timings.append(finished)
+    return timings
+
+
+def summarize(directory: str) -> Dict:
+    """
+    The progress and throughput of the batch in the directory so far.
+    """
+    manifest = _read_json(os.path.join(directory, MANIFEST))
+    shards = shard_timings(directory, manifest)
+    jobs = sum(shard["jobs"] for shard in shards)
+    seconds = sum(shard["seconds"] for shard in shards)
+    return {
+        "shards": len(shards),
+        "total_shards": shard_count(manifest),
+        "jobs": jobs,
+        "total_jobs": len(manifest["jobs"]),
+        "failed_jobs": sum(shard["errors"] for shard in shards),
+        "worker_seconds": seconds,
+        "jobs_per_worker_second": jobs / seconds if seconds else 0.0,
+        "slowest_shard_seconds": max(
+            (shard["seconds"] for shard in shards), default=0.0
+        ),
+    }
+
+
+def run_batch(
+    directory: str,
+    jobs: Optional[List[Job]] = None,
+    shard_size: Optional[int] = None,
+    workers: int = 1,
+    match_types: Optional[Sequence[Union[str, Type[MatchType]]]] = None,
+    topn: Optional[int] = None,
+    collapse_stems: Optional[bool] = None,
+    neighbours: Callable[[Seed, int], list] = model_neighbours,
+    lock_timeout: Optional[float] = None,
+) -> Dict:
+    """
+    Runs (or resumes) the batch in the directory, returning its summary along with
+    the throughput of this run and the shards left unfinished. The jobs and settings
+    are recorded in the manifest the first time (with `DEFAULTS` for the ones left
+    out); when resuming they may be left out, and must match the manifest if given.
+    """
+    os.makedirs(directory, exist_ok=True)
+    manifest = _prepare_manifest(
+        directory,
+        {
+            "jobs": jobs,
+            "shard_size": shard_size,
+            "match_types": None
+            if match_types is None
+            else [
+                match_type if isinstance(match_type, str) else match_type.__name__
+                for match_type in match_types
+            ],
+            "topn": topn,
+            "collapse_stems": collapse_stems,
+        },
+    )
+    shard_size = manifest["shard_size"]
+    all_jobs = manifest["jobs"]
+    arguments = dict(
+        match_types=[getattr(matches, name) for name in manifest["match_types"]],
+        topn=manifest["topn"],
+        collapse_stems=manifest["collapse_stems"],
+        neighbours=neighbours,
+        lock_timeout=lock_timeout,
+    )
+    pending = [
+        shard
+        for shard in range(shard_count(manifest))
+        if not os.path.exists(shard_path(directory, shard))
+    ]
+
+    def shard_jobs(shard: int) -> List[Job]:
+        return all_jobs[shard * shard_size : (shard + 1) * shard_size]
+
+    start = time.perf_counter()
+    jobs_run = 0
+
+    def record(timings: Optional[Dict]) -> None:
+        nonlocal jobs_run
+        if timings is not None:
+            jobs_run += timings["jobs"]
+
+    # A failed shard shouldn't keep the others from being run and recorded, so the
+    # first failure is only raised once they are all done:
+    failure = None
+    if workers == 1:
+        for shard in pending:
+            try:
+                record(run_shard(directory, shard, shard_jobs(shard), **arguments))
+            except Exception as error:
+                failure = failure or error
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(
+                    run_shard, directory, shard, shard_jobs(shard), **arguments
+                )
+                for shard in pending
+            ]
+            for future in as_completed(futures):
+                try:
+                    record(future.result())
+                except Exception as error:
+                    failure = failure or error
+    if failure is not None:
+        raise failure
+    seconds = time.perf_counter() - start
+    return {
+        **summarize(directory),
+        # Held by other processes (or by locks that aren't stale yet):
+        "pending_shards": [
+            shard
+            for shard in pending
+            if not os.path.exists(shard_path(directory, shard))
+        ],
+        "run_jobs": jobs_run,
+        "run_seconds": seconds,
+        "run_jobs_per_second": jobs_run / seconds if seconds else 0.0,
+    }
+
+
+def load_results(directory: str) -> Iterator[Dict]:
+    """
+    The results of the finished shards' jobs, in order. A job that failed has an
+    "error" instead of "matches".
+    """
+    manifest = _read_json(os.path.join(directory, MANIFEST))
+    for shard in range(shard_count(manifest)):
+        path = shard_path(directory, shard)
+        if os.path.exists(path):
+            yield from _read_json(path)["results"]
+
+
+def read_seeds(path: str) -> List[Job]:
+    """
+    Every line holds two seeds separated by whitespace. A seed made of several words
+    joined by "+" stands for the sum of their vectors.
+    """
+    jobs = []
+    with open(path, "r") as f:
+        for number, line in enumerate(f, start=1):
+            seeds = line.split()
+            if not seeds:
+                continue
+            if len(seeds) != 2:
+                raise ValueError(
+                    "Line {} of {} has {} seeds instead of two.".format(
+                        number, path, len(seeds)
+                    )
+                )
+            jobs.append(
+                [seed if "+" not in seed else seed.split("+") for seed in seeds]
+            )
+    return jobs
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("directory")
+    parser.add_argument("--seeds", help="Seed pairs file (left out when resuming)")
+    parser.add_argument("--shard-size", type=int)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--topn", type=int)
+    parser.add_argument("--match-types", nargs="+")
+    parser.add_argument("--collapse-stems", action="store_true", default=None)
+    parser.add_argument(
+        "--lock-timeout",
+        type=float,
+        help="Seconds after which another host's shard lock is taken over",
+    )
+    args = parser.parse_args()
+    summary = run_batch(
+        args.directory,
+        jobs=read_seeds(args.seeds) if args.seeds else None,
+        shard_size=args.shard_size,
+        workers=args.workers,
+        match_types=args.match_types,
+        topn=args.topn,
+        collapse_stems=args.collapse_stems,
+        lock_timeout=args.lock_timeout,
+    )
+    print(json.dumps(summary, indent=2))
+    if summary["pending_shards"]:
+        print(
+            "{} shards are still locked by other processes - run again to finish "
+            "them, with --lock-timeout to take over locks left behind.".format(
+                len(summary["pending_shards"])
+            ),
+            file=sys.stderr,
+        )
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
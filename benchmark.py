@@ -0,0 +1,151 @@
+"""
+Rough performance checks. Run with `python benchmark.py`; exits with a non-zero status
+if anything is over its budget.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+REPO = os.path.dirname(os.path.abspath(__file__))
+
+# Seconds it may take a fresh interpreter to import each module. Nothing heavy (the
+# alignment dictionary, the embedding model) may be loaded on import.
+IMPORT_BUDGETS = {
+    "alignment": 0.5,
+    "matches": 0.5,
+    "puntomatic": 0.5,
+}
+# How much longer than the slowest match type alone a fused query may take, when the
+# match types run in parallel (to pay for sending the pairs and matches between
+# processes):
+FUSED_BUDGET = 1.25
+
+
+def import_time(module: str, runs: int = 5) -> float:
+    """
+    The median time it takes a fresh interpreter to import the module, measured in
+    the interpreter itself so the interpreter's own startup isn't counted.
+    """
+    code = (
+        "import time; start = time.perf_counter(); import {}; "
+        "print(time.perf_counter() - start)".format(module)
+    )
+    # Run from somewhere else, to make sure nothing depends on the working directory:
+    return statistics.median(
+        float(
+            subprocess.run(
+                [sys.executable, "-c", code],
+                cwd=os.path.dirname(REPO),
+                env={**os.environ, "PYTHONPATH": REPO},
+                capture_output=True,
+                check=True,
+                text=True,
+            ).stdout
+        )
+        for _ in range(runs)
+    )
+
+
+def query_times(size: int = 60, runs: int = 3) -> dict:
+    """
+    The best time out of `runs` of a query of `size` x `size` random dictionary words,
+    with every match type alone and all of them fused into one `analyze_groups` - in
+    this process, and with the match types in parallel worker processes.
+    """
+    from matches import OrthographicMatch, PhoneticMatch, RhymeMatch, analyze_groups
+    from phonetics.phonetics import get_alignment_table, warm_up
+
+    match_types = [OrthographicMatch, PhoneticMatch, RhymeMatch]
+    words = sorted(get_alignment_table())
+    generator = random.Random(0)
+    first_group, second_group = [
+        [(word, generator.random()) for word in generator.sample(words, size)]
+        for _ in range(2)
+    ]
+
+    def best_time(query) -> float:
+        # The first run warms the pronunciation cache up, like a long-running server
+        query()
+        times = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            query()
+            times.append(time.perf_counter() - start)
+        return min(times)
+
+    times = {
+        match_type.__name__: best_time(
+            lambda: match_type.analyze_groups(first_group, second_group)
+        )
+        for match_type in match_types
+    }
+    times["fused"] = best_time(
+        lambda: analyze_groups(first_group, second_group, match_types)
+    )
+    with ProcessPoolExecutor(
+        max_workers=len(match_types), initializer=warm_up
+    ) as executor:
+        times["parallel"] = best_time(
+            lambda: analyze_groups(
+                first_group, second_group, match_types, executor=executor
+            )
+        )
+    return times
+
+
+def available_cpus() -> int:
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def main() -> int:
+    failed = False
+    for module, budget in IMPORT_BUDGETS.items():
+        took = import_time(module)
+        over = took > budget
+        failed |= over
+        print(
+            "import {:<12} {:.3f}s (budget {:.3f}s){}".format(
+                module, took, budget, " OVER BUDGET" if over else ""
+            )
+        )
+    try:
+        times = query_times()
+    except FileNotFoundError as error:
+        print("query benchmark skipped - no alignment dictionary ({})".format(error))
+    else:
+        fused = times.pop("fused")
+        parallel = times.pop("parallel")
+        for name, took in times.items():
+            print("query {:<18} {:.3f}s".format(name, took))
+        slowest = max(times.values())
+        print(
+            "query {:<18} {:.3f}s (separately {:.3f}s)".format(
+                "fused", fused, sum(times.values())
+            )
+        )
+        # The match types can only run side by side with a core for each of them:
+        checked = available_cpus() >= len(times)
+        over = checked and parallel > slowest * FUSED_BUDGET
+        failed |= over
+        print(
+            "query {:<18} {:.3f}s (budget {:.3f}s, slowest alone {:.3f}s){}".format(
+                "fused parallel",
+                parallel,
+                slowest * FUSED_BUDGET,
+                slowest,
+                " OVER BUDGET"
+                if over
+                else ("" if checked else " - not checked, too few CPUs"),
+            )
+        )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
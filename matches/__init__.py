@@ -1,3 +1,4 @@
+from .match import analyze_groups, find_all_matches
 from .orthographic_match import OrthographicMatch
 from .phonetic_match import PhoneticMatch
 from .rhyme_match import RhymeMatch
@@ -1,6 +1,26 @@
 from __future__ import annotations
-from typing import List, Tuple, Callable, TypeVar, NamedTuple, Generic, Any
+from typing import (
+    List,
+    Tuple,
+    Callable,
+    TypeVar,
+    NamedTuple,
+    Generic,
+    Any,
+    Dict,
+    Optional,
+    Sequence,
+    Type,
+)
 from toolz import curry
+from concurrent.futures import Executor
+from abc import ABC, abstractmethod
+from inspect import isabstract
+from operator import attrgetter
+from alignment import AlignmentCache
+from phonetics.phonetics import PhoneticWord, get_arpabet
+from profiling import count, stage, timed
+from .stems import collapse_variants
 import string
 
 
@@ -18,6 +38,9 @@ PotentialMatch = Tuple[str, str]
 
 Match = Tuple[str, str, Any]
 
+# The stage ("") and counters every match type reports (see `MatchType.stage_name`):
+PROFILING_COUNTERS = ("", "pairs", "unpronounceable", "pruned", "aligned", "matched")
+
 
 @curry
 def cartesian_product(join: Callable[[A, B], C], xs: List[A], ys: List[B]) -> List[C]:
@@ -34,8 +57,20 @@ prioritized_match_pairs: Callable[
 )
 
 
-class MatchType:
+class MatchType(ABC):
+    # Whether `featurize` needs the word's pronunciation:
+    needs_pronunciation: bool = False
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Built once, so reporting to `profiling` doesn't build strings for every pair:
+        cls.profiling_names = {
+            suffix: cls.stage_name("." + suffix if suffix else "")
+            for suffix in PROFILING_COUNTERS
+        }
+
     @staticmethod
+    @timed("sterilize_group")
     def sterilize_group(group: List[Tuple[str, float]]) -> List[Prioritized[str]]:
         return [
             Prioritized(*element)
@@ -43,14 +78,187 @@ class MatchType:
             if all(c in string.printable for c in element[0])
         ]
 
+    @classmethod
+    def featurize(cls, word: str, pronunciation: Optional[PhoneticWord]) -> Any:
+        """
+        Returns whatever `match_pair` needs to know about a word, or None if the word
+        can't be matched by this match type.
+        """
+        return word
+
+    @classmethod
+    @abstractmethod
+    def match_pair(
+        cls, first: Any, second: Any, cache: Optional[AlignmentCache] = None
+    ) -> Optional[Tuple[Any, float]]:
+        """
+        Matches the features of two words, returning the match description and its
+        score, or None if they don't match. The cache (if any) is only ever used for
+        this match type's alignments.
+        """
+
+    @classmethod
+    def stage_name(cls, suffix: str = "") -> str:
+        """
+        The name this match type's work is reported under by `profiling`. The counters
+        are `pairs`, `unpronounceable` (pairs with a word that can't be pronounced),
+        `pruned` (pairs rejected without aligning them), `aligned` and `matched`.
+        """
+        return "find_matches." + cls.__name__ + suffix
+
+    @classmethod
+    def find_matches(
+        cls, options: List[Prioritized[PotentialMatch]]
+    ) -> List[Prioritized[Match]]:
+        return find_all_matches(options, [cls])[cls]
+
     @classmethod
     def analyze_groups(
         cls,
         first_group: List[Tuple[str, float]],
         second_group: List[Tuple[str, float]],
+        collapse_stems: bool = False,
+        expand_variants: bool = True,
     ) -> List[Prioritized[Match]]:
-        return cls.find_matches(
-            prioritized_match_pairs(
-                cls.sterilize_group(first_group), cls.sterilize_group(second_group)
+        return analyze_groups(
+            first_group,
+            second_group,
+            [cls],
+            collapse_stems=collapse_stems,
+            expand_variants=expand_variants,
+        )[cls]
+
+
+def find_all_matches(
+    options: List[Prioritized[PotentialMatch]],
+    match_types: Sequence[Type[MatchType]],
+    executor: Optional[Executor] = None,
+) -> Dict[Type[MatchType], List[Prioritized[Match]]]:
+    """
+    Runs all the given match types over the options. Every word is pronounced and
+    featurized once, no matter how many pairs or match types it is in.
+
+    With an executor, the match types run at the same time, each in its own task, so
+    the query takes about as long as the slowest match type alone. What they do in
+    other processes isn't profiled.
+    """
+    # Match types are used through their classmethods and never instantiated, so `ABC`
+    # alone wouldn't stop an abstract one from being run:
+    for match_type in match_types:
+        if isabstract(match_type):
+            raise TypeError(
+                "Can't match with abstract match type {}.".format(match_type.__name__)
             )
+    pronounce = any(match_type.needs_pronunciation for match_type in match_types)
+    features: Dict[str, Tuple[Any, ...]] = {}
+
+    def featurize(word: str) -> None:
+        if word in features:
+            count("featurize.cache_hits")
+            return
+        count("featurize.cache_misses")
+        with stage("featurize"):
+            pronunciation = get_arpabet(word) if pronounce else None
+            features[word] = tuple(
+                match_type.featurize(word, pronunciation) for match_type in match_types
+            )
+
+    for ((first, second), _) in options:
+        featurize(first)
+        featurize(second)
+    # Only the features of its own match type are sent to every task:
+    arguments = [
+        (match_type, options, {word: found[i] for word, found in features.items()})
+        for i, match_type in enumerate(match_types)
+    ]
+    if executor is not None and len(match_types) > 1:
+        with stage("parallel_matching"):
+            futures = [executor.submit(match_options, *each) for each in arguments]
+            results = [future.result() for future in futures]
+    else:
+        results = [match_options(*each) for each in arguments]
+    matches = {}
+    for match_type, (found, unpronounceable) in zip(match_types, results):
+        names = match_type.profiling_names
+        count(names["pairs"], len(options))
+        count(names["unpronounceable"], unpronounceable)
+        count(names["matched"], len(found))
+        matches[match_type] = found
+    return matches
+
+
+def match_options(
+    match_type: Type[MatchType],
+    options: List[Prioritized[PotentialMatch]],
+    features: Dict[str, Any],
+) -> Tuple[List[Prioritized[Match]], int]:
+    """
+    Runs the match type over the options, given the features of all their words.
+    Returns the ranked matches, and how many options had a word that can't be matched.
+    """
+    stage_name = match_type.profiling_names[""]
+    # Made for every call, so concurrent queries don't share it:
+    cache = AlignmentCache()
+    matches = []
+    unpronounceable = 0
+    for ((first, second), priority) in options:
+        (first_features, second_features) = (features[first], features[second])
+        if first_features is None or second_features is None:
+            unpronounceable += 1
+            continue
+        with stage(stage_name):
+            result = match_type.match_pair(first_features, second_features, cache)
+        if result is None:
+            continue
+        (description, score) = result
+        matches.append(
+            Prioritized(value=(first, second, description), priority=priority * score)
         )
+    with stage("sort"):
+        matches.sort(key=attrgetter("priority"), reverse=True)
+    return (matches, unpronounceable)
+
+
+def analyze_groups(
+    first_group: List[Tuple[str, float]],
+    second_group: List[Tuple[str, float]],
+    match_types: Sequence[Type[MatchType]],
+    collapse_stems: bool = False,
+    expand_variants: bool = True,
+    executor: Optional[Executor] = None,
+) -> Dict[Type[MatchType], List[Prioritized[Match]]]:
+    """
+    Like `MatchType.analyze_groups`, but for several match types at once - the groups
+    are sterilized and paired only once, and the words' features are shared. With an
+    executor, the match types run in parallel (see `find_all_matches`).
+
+    With `collapse_stems`, the inflectional variants in each group are put right after
+    their representative, so their alignments reuse most of its cells (see `stems`).
+    Unless `expand_variants` is off, the variants are still matched and returned.
+    """
+    with stage("analyze_groups"):
+        first_group = MatchType.sterilize_group(first_group)
+        second_group = MatchType.sterilize_group(second_group)
+        if collapse_stems:
+            with stage("collapse_variants"):
+                first_group = collapse_group(first_group, expand_variants)
+                second_group = collapse_group(second_group, expand_variants)
+        with stage("pairing"):
+            options = prioritized_match_pairs(first_group, second_group)
+        return find_all_matches(options, match_types, executor)
+
+
+def collapse_group(
+    group: List[Prioritized[str]], expand_variants: bool
+) -> List[Prioritized[str]]:
+    """
+    The group ordered cluster by cluster (see `stems.collapse_variants`), or only the
+    representatives of the clusters without `expand_variants`.
+    """
+    clusters = collapse_variants(group, get_arpabet)
+    count("collapse_variants.collapsed", len(group) - len(clusters))
+    return [
+        member
+        for members in clusters.values()
+        for member in (members if expand_variants else members[:1])
+    ]
@@ -1,8 +1,12 @@
 from __future__ import annotations
-from typing import List
-from .match import Match, PotentialMatch, Prioritized, MatchType
-from alignment import smith_waterman
-from operator import attrgetter
+from typing import Counter, Optional, Tuple
+from .match import MatchType
+from phonetics.phonetics import PhoneticWord
+from alignment import AlignmentCache, smith_waterman
+from profiling import count
+import collections
+
+Spelling = Tuple[str, Counter[str]]
 
 
 class OrthographicMatch(MatchType):
@@ -11,34 +15,41 @@ class OrthographicMatch(MatchType):
     """
 
     @classmethod
-    def find_matches(
-        cls, options: List[Prioritized[PotentialMatch]]
-    ) -> List[Prioritized[Match]]:
-        matches: List[Prioritized[Match]] = []
-        for ((first, second), priority) in options:
-            (
-                match_in_first,
-                match_in_second,
+    def featurize(cls, word: str, pronunciation: Optional[PhoneticWord]) -> Spelling:
+        return (word, collections.Counter(word))
+
+    @classmethod
+    def match_pair(
+        cls, first: Spelling, second: Spelling, cache: Optional[AlignmentCache] = None
+    ) -> Optional[Tuple[str, float]]:
+        ((first, first_letters), (second, second_letters)) = (first, second)
+        # Every matched letter scores 1 and everything else is a penalty, so the score
+        # can't be more than the number of letters the words share:
+        if sum((first_letters & second_letters).values()) <= 1:
+            count(cls.profiling_names["pruned"])
+            return None
+        count(cls.profiling_names["aligned"])
+        (
+            match_in_first,
+            match_in_second,
+            score,
+            idx_in_first,
+            idx_in_second,
+        ) = smith_waterman(
+            lambda x, y: 1 if x == y else -1,
+            lambda x: 1,
+            first,
+            second,
+            cache=cache,
+        )
+        if score > 1:
+            return (
+                "{} {} {} {}".format(
+                    match_in_first,
+                    match_in_second,
+                    idx_in_first,
+                    idx_in_second,
+                ),
                 score,
-                idx_in_first,
-                idx_in_second,
-            ) = smith_waterman(
-                lambda x, y: 1 if x == y else -1, lambda x: 1, first, second
             )
-            if score > 1:
-                matches.append(
-                    Prioritized(
-                        value=(
-                            first,
-                            second,
-                            "{} {} {} {}".format(
-                                match_in_first,
-                                match_in_second,
-                                idx_in_first,
-                                idx_in_second,
-                            ),
-                        ),
-                        priority=priority * score,
-                    )
-                )
-        return sorted(matches, key=attrgetter("priority"), reverse=True)
+        return None
@@ -1,9 +1,10 @@
 from __future__ import annotations
-from typing import List
-from .match import Match, PotentialMatch, Prioritized, MatchType
-from alignment import smith_waterman
-from phonetics.phonetics import get_arpabet, phonetic_similarity, phonetic_skippability
-from operator import attrgetter
+from typing import List, Optional, Tuple
+from .match import MatchType
+from alignment import AlignmentCache, smith_waterman
+from phonetics.phonetics import PhoneticWord, phonetic_similarity, phonetic_skippability
+from phonetics.types import Phoneme
+from profiling import count
 
 
 class PhoneticMatch(MatchType):
@@ -11,47 +12,45 @@ class PhoneticMatch(MatchType):
     There are similar-sounding parts in both words.
     """
 
+    needs_pronunciation = True
+
+    @classmethod
+    def featurize(
+        cls, word: str, pronunciation: Optional[PhoneticWord]
+    ) -> Optional[List[Phoneme]]:
+        if not pronunciation:
+            return None
+        return pronunciation.unaligned_phonemes
+
     @classmethod
-    def find_matches(
-        cls, options: List[Prioritized[PotentialMatch]]
-    ) -> List[Prioritized[Match]]:
-        matches: List[Prioritized[Match]] = []
-        for ((first, second), priority) in options:
-            # TODO: make this monadic and pretty somehow:
-            first_phonemes = get_arpabet(first)
-            if not first_phonemes:
-                continue
-            first_phonemes = first_phonemes.unaligned_phonemes
-            second_phonemes = get_arpabet(second)
-            if not second_phonemes:
-                continue
-            second_phonemes = second_phonemes.unaligned_phonemes
-            (
-                match_in_first,
-                match_in_second,
+    def match_pair(
+        cls,
+        first_phonemes: List[Phoneme],
+        second_phonemes: List[Phoneme],
+        cache: Optional[AlignmentCache] = None,
+    ) -> Optional[Tuple[str, float]]:
+        count(cls.profiling_names["aligned"])
+        (
+            match_in_first,
+            match_in_second,
+            score,
+            idx_in_first,
+            idx_in_second,
+        ) = smith_waterman(
+            phonetic_similarity,
+            phonetic_skippability,
+            first_phonemes,
+            second_phonemes,
+            cache=cache,
+        )
+        if score > 1:
+            return (
+                "{} {} {} {}".format(
+                    match_in_first,
+                    match_in_second,
+                    idx_in_first,
+                    idx_in_second,
+                ),
                 score,
-                idx_in_first,
-                idx_in_second,
-            ) = smith_waterman(
-                phonetic_similarity,
-                phonetic_skippability,
-                first_phonemes,
-                second_phonemes,
             )
-            if score > 1:
-                matches.append(
-                    Prioritized(
-                        value=(
-                            first,
-                            second,
-                            "{} {} {} {}".format(
-                                match_in_first,
-                                match_in_second,
-                                idx_in_first,
-                                idx_in_second,
-                            ),
-                        ),
-                        priority=priority * score,
-                    )
-                )
-        return sorted(matches, key=attrgetter("priority"), reverse=True)
+        return None
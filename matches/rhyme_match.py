@@ -1,10 +1,13 @@
 from __future__ import annotations
-from typing import List
-from .match import Match, PotentialMatch, Prioritized, MatchType
+from typing import List, Optional, Tuple
+from .match import MatchType
+from phonetics.phonetics import PhoneticWord
 from phonetics.stress import equal_ignore_stress
-from phonetics.phonetics import get_arpabet
-from alignment import smith_waterman
-from operator import attrgetter
+from phonetics.types import Phoneme
+from alignment import AlignmentCache, smith_waterman
+from profiling import count
+
+RhymeEnding = Tuple[Phoneme, List[Phoneme]]
 
 
 class RhymeMatch(MatchType):
@@ -12,39 +15,38 @@ class RhymeMatch(MatchType):
     The words rhyme - the stressed syllable is the same and the rest if similar.
     """
 
+    needs_pronunciation = True
+
+    @classmethod
+    def featurize(
+        cls, word: str, pronunciation: Optional[PhoneticWord]
+    ) -> Optional[RhymeEnding]:
+        if not pronunciation:
+            return None
+        return pronunciation.rhyme_ending
+
     @classmethod
-    def find_matches(
-        cls, options: List[Prioritized[PotentialMatch]]
-    ) -> List[Prioritized[Match]]:
-        matches: List[Prioritized[Match]] = []
-        for ((first, second), priority) in options:
-            # TODO: make this monadic and pretty somehow:
-            first_phonemes = get_arpabet(first)
-            if not first_phonemes:
-                continue
-            (first_stressed, first_phonemes) = first_phonemes.rhyme_ending
-            second_phonemes = get_arpabet(second)
-            if not second_phonemes:
-                continue
-            (second_stressed, second_phonemes) = second_phonemes.rhyme_ending
-            if not equal_ignore_stress(first_stressed, second_stressed):
-                continue
-            (alignment_in_first, alignment_in_second, score, _, _) = smith_waterman(
-                lambda x, y: 1 if x == y else -1,
-                lambda x: 1,
-                first_phonemes,
-                second_phonemes,
-                needleman=True,
-            )
-            if score > 1:
-                matches.append(
-                    Prioritized(
-                        value=(
-                            first,
-                            second,
-                            "{} {}".format(alignment_in_first, alignment_in_second),
-                        ),
-                        priority=priority * score,
-                    )
-                )
-        return sorted(matches, key=attrgetter("priority"), reverse=True)
+    def match_pair(
+        cls,
+        first: RhymeEnding,
+        second: RhymeEnding,
+        cache: Optional[AlignmentCache] = None,
+    ) -> Optional[Tuple[str, float]]:
+        (first_stressed, first_phonemes) = first
+        (second_stressed, second_phonemes) = second
+        # The cheap check goes first, so most pairs never get aligned:
+        if not equal_ignore_stress(first_stressed, second_stressed):
+            count(cls.profiling_names["pruned"])
+            return None
+        count(cls.profiling_names["aligned"])
+        (alignment_in_first, alignment_in_second, score, _, _) = smith_waterman(
+            lambda x, y: 1 if x == y else -1,
+            lambda x: 1,
+            first_phonemes,
+            second_phonemes,
+            needleman=True,
+            cache=cache,
+        )
+        if score > 1:
+            return ("{} {}".format(alignment_in_first, alignment_in_second), score)
+        return None
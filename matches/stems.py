@@ -0,0 +1,93 @@
+"""
+Embedding neighbours are full of inflectional variants of the same word ("beret" and
+"berets", "rhyming" and "rhymes"). Their spellings and pronunciations share long
+prefixes, so aligning the variants of a word one after the other lets every alignment
+reuse most of the previous one's cells (see `alignment.AlignmentCache`).
+"""
+from __future__ import annotations
+from typing import Callable, Dict, List, Optional, Tuple, TYPE_CHECKING
+from phonetics.phonetics import PhoneticWord
+from phonetics.stress import ignore_stress
+
+if TYPE_CHECKING:
+    from .match import Prioritized
+
+# The spelling suffixes of inflections, and the sounds they may add to the word:
+INFLECTIONS: Dict[str, Tuple[Tuple[str, ...], ...]] = {
+    "s": (("Z",), ("S",), ("IH", "Z"), ("AH", "Z")),
+    "es": (("IH", "Z"), ("AH", "Z"), ("Z",), ("S",)),
+    "ed": (("D",), ("T",), ("IH", "D"), ("AH", "D")),
+    "ing": (("IH", "NG"), ("IH", "N", "G")),
+}
+MINIMUM_STEM_LENGTH = 3
+VOWELS = set("aeiouy")
+
+
+def possible_bases(word: str) -> List[Tuple[str, str]]:
+    """
+    The words this one could be an inflection of, by spelling alone, with the suffix
+    that inflects each of them - "rhyming" could be "rhym" or "rhyme" with "ing", and
+    "stopped" could be "stopp" or "stop" with "ed".
+    """
+    bases = []
+    for suffix in INFLECTIONS:
+        stem = word[: -len(suffix)]
+        if not word.endswith(suffix) or len(stem) < MINIMUM_STEM_LENGTH:
+            continue
+        bases.append((stem, suffix))
+        if suffix in ("ed", "ing") and stem[-1] not in VOWELS:
+            # A silent "e" is dropped before the suffix ("rhyme" -> "rhyming"), but
+            # not a pronounced one ("see" -> "seeing")
+            bases.append((stem + "e", suffix))
+            if stem[-1] == stem[-2]:
+                # A doubled consonant ("stop" -> "stopped")
+                bases.append((stem[:-1], suffix))
+    return bases
+
+
+def sounds_inflected(
+    base: PhoneticWord, variant: PhoneticWord, suffix: str
+) -> bool:
+    """
+    Whether the variant is pronounced like the base followed by the suffix.
+    """
+    base_sounds = [ignore_stress(phoneme) for phoneme in base.unaligned_phonemes]
+    variant_sounds = [ignore_stress(phoneme) for phoneme in variant.unaligned_phonemes]
+    return variant_sounds[: len(base_sounds)] == base_sounds and tuple(
+        variant_sounds[len(base_sounds) :]
+    ) in INFLECTIONS[suffix]
+
+
+def inflection_base(
+    word: str, pronounce: Callable[[str], Optional[PhoneticWord]]
+) -> Optional[str]:
+    """
+    The word this one is an inflection of, if it is both spelt and pronounced like
+    one - "fined" is "fine" inflected, but "fin" and "fine" sound different, and "seed"
+    isn't "see" with a dropped silent "e". The base doesn't have to be in the group.
+    """
+    pronunciation = pronounce(word)
+    if pronunciation is None:
+        return None
+    for base, suffix in possible_bases(word):
+        base_pronunciation = pronounce(base)
+        if base_pronunciation is not None and sounds_inflected(
+            base_pronunciation, pronunciation, suffix
+        ):
+            return base
+    return None
+
+
+def collapse_variants(
+    group: List[Prioritized[str]], pronounce: Callable[[str], Optional[PhoneticWord]]
+) -> Dict[str, List[Prioritized[str]]]:
+    """
+    Clusters the inflectional variants in the group. Maps the representative of every
+    cluster (its member with the highest priority) to all of the members, the
+    representative first.
+    """
+    clusters: Dict[str, List[Prioritized[str]]] = {}
+    for element in sorted(group, key=lambda element: -element.priority):
+        base = inflection_base(element.value, pronounce) or element.value
+        clusters.setdefault(base, []).append(element)
+    return {members[0].value: members for members in clusters.values()}
@@ -1,6 +1,11 @@
 from typing import NamedTuple, List, NewType, Dict, Tuple, Optional
+import os
 import re
 from utils import possible_splits
+from slicing import prefix_offsets, idx_inflate_many, idx_deflate_many
+from functools import cached_property
+from math import floor, ceil
+import numpy as np
 import json
 from methodtools import lru_cache
 from collections.abc import Mapping
@@ -12,6 +17,7 @@ from .stress import (
 )
 from .diphthongs import DIPHTHONGS, unroll_diphthong
 from .types import Phoneme, Grapheme
+from profiling import count, enabled, timed
 
 
 class PhoneticWord:
@@ -68,6 +74,9 @@ class PhoneticWord:
                 + self[idx + idx_delta + 1 :]
             ).parts
             idx_delta += len(unrolled) - 1
+        # The chunks were replaced, so the cached offsets are stale:
+        self.__dict__.pop("grapheme_offsets", None)
+        self.__dict__.pop("phoneme_offsets", None)
 
     @property
     def parts(self):
@@ -103,17 +112,50 @@ class PhoneticWord:
     def unaligned_phonemes(self):
         return sum(self.phonemes, start=[])
 
-    # def _slice_by(source_parameter):
-    #     @functools.wraps
-    #     def slicer(self, start, stop):
-    #         pass
-    #         # target_parameter = self.OTHER_PARAMETER[source_parameter]
-    #         # start_idx = idx_deflate()
+    @property
+    def unaligned_graphemes(self):
+        return sum(self.graphemes, start=[])
+
+    @cached_property
+    def grapheme_offsets(self) -> np.ndarray:
+        return np.array(prefix_offsets(self.graphemes))
+
+    @cached_property
+    def phoneme_offsets(self) -> np.ndarray:
+        return np.array(prefix_offsets(self.phonemes))
+
+    def _map_by(source_offsets, target_offsets):
+        def mapper(self, indices) -> np.ndarray:
+            """
+            Maps flat indices into one of the word's sequences to the (fractional)
+            indices of the corresponding positions in the other one.
+            """
+            return idx_deflate_many(
+                getattr(self, target_offsets),
+                idx_inflate_many(getattr(self, source_offsets), indices),
+            )
+
+        return mapper
+
+    graphemes_to_phonemes = _map_by("grapheme_offsets", "phoneme_offsets")
+    phonemes_to_graphemes = _map_by("phoneme_offsets", "grapheme_offsets")
 
-    #     return slicer
+    def _slice_by(mapper, target_parameter):
+        def slicer(self, start, stop) -> list:
+            """
+            Returns the part of the other sequence that corresponds to the slice
+            [start:stop] of this one, including chunks that are only partly in it.
+            """
+            mapped_start, mapped_stop = mapper(self, [start, stop])
+            return getattr(self, target_parameter)[
+                floor(mapped_start) : ceil(mapped_stop)
+            ]
 
-    # slice_by_grapheme = _slice_by("grapheme")
-    # slice_by_phoneme = _slice_by("phoneme")
+        return slicer
+
+    slice_by_grapheme = _slice_by(graphemes_to_phonemes, "unaligned_phonemes")
+    slice_by_phoneme = _slice_by(phonemes_to_graphemes, "unaligned_graphemes")
+    del _map_by, _slice_by
 
     @property
     def rhyme_ending(self):
@@ -145,7 +187,10 @@ class PhoneticDictionary(Mapping):
     def __len__(self):
         return len(self._raw_dict)
 
+    @timed("pronounce")
     def pronounce(self, bit_of_language: str) -> Optional[PhoneticWord]:
+        if enabled():
+            misses_before = self._pronounce_recursive.cache_info().misses
         try:
             result = self._pronounce_recursive(
                 tuple(re.split("[^a-z']+", bit_of_language.lower()))
@@ -156,6 +201,12 @@ class PhoneticDictionary(Mapping):
                 return None
         except (IndexError, KeyError):
             return None
+        finally:
+            if enabled():
+                if self._pronounce_recursive.cache_info().misses > misses_before:
+                    count("pronounce.cache_misses")
+                else:
+                    count("pronounce.cache_hits")
 
     @lru_cache()
     def _pronounce_recursive(self, words: Tuple[str, ...]) -> PhoneticWord:
@@ -185,12 +236,59 @@ class PhoneticDictionary(Mapping):
         return options[-1]
 
 
-with open("./alignment.json", "r") as f:
-    alignment_table: PhoneticDictionary = PhoneticDictionary(json.load(f))
+ALIGNMENT_PATH_VARIABLE = "PUNTOMATIC_ALIGNMENT"
+DEFAULT_ALIGNMENT_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alignment.json"
+)
+
+_alignment_table: Optional[PhoneticDictionary] = None
+
+
+def alignment_path() -> str:
+    """
+    The path of the alignment dictionary - `$PUNTOMATIC_ALIGNMENT` if it is set,
+    otherwise `alignment.json` at the root of the repository.
+    """
+    return os.environ.get(ALIGNMENT_PATH_VARIABLE, DEFAULT_ALIGNMENT_PATH)
+
+
+@timed("load_alignment_table")
+def load_alignment_table(path: Optional[str] = None) -> PhoneticDictionary:
+    """
+    Loads the alignment dictionary from the given path (or `alignment_path()`) and
+    uses it from now on.
+    """
+    global _alignment_table
+    with open(path or alignment_path(), "r") as f:
+        _alignment_table = PhoneticDictionary(json.load(f))
+    return _alignment_table
+
+
+def get_alignment_table() -> PhoneticDictionary:
+    """
+    Returns the alignment dictionary, loading it on first use.
+    """
+    if _alignment_table is None:
+        return load_alignment_table()
+    return _alignment_table
+
+
+def warm_up() -> None:
+    """
+    Loads the alignment dictionary up front, so the first query doesn't pay for it.
+    """
+    get_alignment_table()
+
+
+def __getattr__(name):
+    # Keeps `phonetics.phonetics.alignment_table` working without loading it on import
+    if name == "alignment_table":
+        return get_alignment_table()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def get_arpabet(bit_of_language):
-    return alignment_table.pronounce(bit_of_language)
+    return get_alignment_table().pronounce(bit_of_language)
 
 
 def phonetic_similarity(first_phoneme, second_phoneme):
@@ -0,0 +1,149 @@
+"""
+Opt-in instrumentation of the matching pipeline. Nothing is measured unless a `profile`
+block is active, in which case every stage reports its wall time and call count and
+the pipeline reports what it did (pairs pruned/aligned, cache hits, DP cells computed):
+
+    with profile() as metrics:
+        RhymeMatch.analyze_groups(first_group, second_group)
+    print(metrics.to_json())
+"""
+from __future__ import annotations
+from typing import Callable, Dict, Iterator, Optional, TypeVar
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from collections import defaultdict
+from functools import wraps
+import json
+import time
+
+F = TypeVar("F", bound=Callable)
+
+# The metrics of the innermost active `profile` block. A context variable rather than a
+# global, so that blocks in different threads (or tasks) don't collect each other's work:
+_metrics: ContextVar[Optional[Metrics]] = ContextVar("metrics", default=None)
+_disabled_stage = nullcontext()
+
+
+class Metrics:
+    """
+    Wall time and calls per stage, and counters of everything else. Counters named
+    `<cache>.cache_hits` and `<cache>.cache_misses` are reported as a hit rate as well.
+    """
+
+    def __init__(self):
+        self.seconds: Dict[str, float] = defaultdict(float)
+        self.calls: Dict[str, int] = defaultdict(int)
+        self.counters: Dict[str, int] = defaultdict(int)
+
+    @property
+    def cache_hit_rates(self) -> Dict[str, float]:
+        caches = {
+            name.rsplit(".", 1)[0]
+            for name in self.counters
+            if name.endswith((".cache_hits", ".cache_misses"))
+        }
+        rates = {}
+        for cache in caches:
+            hits = self.counters.get(cache + ".cache_hits", 0)
+            total = hits + self.counters.get(cache + ".cache_misses", 0)
+            rates[cache] = hits / total if total else 0.0
+        return rates
+
+    def to_dict(self) -> Dict:
+        return {
+            "stages": {
+                name: {"seconds": self.seconds[name], "calls": self.calls[name]}
+                for name in sorted(self.seconds)
+            },
+            "counters": dict(sorted(self.counters.items())),
+            "cache_hit_rates": dict(sorted(self.cache_hit_rates.items())),
+        }
+
+    def to_json(self, **kwargs) -> str:
+        return json.dumps(self.to_dict(), **kwargs)
+
+    def to_prometheus(self, prefix: str = "puntomatic") -> str:
+        """
+        The metrics in the Prometheus text exposition format.
+        """
+        lines = []
+
+        def family(name, kind, label, values):
+            lines.append("# TYPE {}_{} {}".format(prefix, name, kind))
+            for key, value in sorted(values.items()):
+                lines.append(
+                    '{}_{}{{{}="{}"}} {}'.format(prefix, name, label, key, value)
+                )
+
+        family("stage_seconds_total", "counter", "stage", self.seconds)
+        family("stage_calls_total", "counter", "stage", self.calls)
+        family("events_total", "counter", "event", self.counters)
+        family("cache_hit_ratio", "gauge", "cache", self.cache_hit_rates)
+        return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def profile(
+    callback: Optional[Callable[[Metrics], None]] = None
+) -> Iterator[Metrics]:
+    """
+    Collects metrics for everything run inside the block, and passes them to the
+    callback (if there is one) when the block exits.
+    """
+    metrics = Metrics()
+    token = _metrics.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _metrics.reset(token)
+        if callback is not None:
+            callback(metrics)
+
+
+def enabled() -> bool:
+    return _metrics.get() is not None
+
+
+def count(name: str, amount: int = 1) -> None:
+    metrics = _metrics.get()
+    if metrics is not None:
+        metrics.counters[name] += amount
+
+
+@contextmanager
+def _measured_stage(metrics: Metrics, name: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.seconds[name] += time.perf_counter() - start
+        metrics.calls[name] += 1
+
+
+def stage(name: str):
+    """
+    A context manager timing its block as the named stage.
+    """
+    metrics = _metrics.get()
+    if metrics is None:
+        return _disabled_stage
+    return _measured_stage(metrics, name)
+
+
+def timed(name: str) -> Callable[[F], F]:
+    """
+    Times every call to the decorated function as the named stage.
+    """
+
+    def decorator(function: F) -> F:
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            metrics = _metrics.get()
+            if metrics is None:
+                return function(*args, **kwargs)
+            with _measured_stage(metrics, name):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
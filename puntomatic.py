@@ -1,6 +1,54 @@
 from matches import OrthographicMatch, PhoneticMatch, RhymeMatch
 from phonetics.phonetics import *
+import os
 
-import gensim.downloader as api
+MODEL_VARIABLE = "PUNTOMATIC_MODEL"
+DEFAULT_MODEL = "glove-wiki-gigaword-100"
 
-model = api.load("glove-wiki-gigaword-100")
+_model = None
+
+
+def get_model():
+    """
+    Returns the word embedding model - `$PUNTOMATIC_MODEL` if it is set, otherwise
+    `glove-wiki-gigaword-100` - loading it on first use.
+    """
+    global _model
+    if _model is None:
+        import gensim.downloader as api
+
+        _model = api.load(os.environ.get(MODEL_VARIABLE, DEFAULT_MODEL))
+    return _model
+
+
+def neighbours(seed, topn: int = 100):
+    """
+    The words closest to the seed in the vector space. A seed may also be a list of
+    words, standing for the sum of their vectors.
+    """
+    model = get_model()
+    words = [seed] if isinstance(seed, str) else seed
+    return model.most_similar(positive=[model[word] for word in words], topn=topn)
+
+
+def warm_up() -> None:
+    """
+    Loads the embedding model and the alignment dictionary up front, for servers that
+    shouldn't make their first query wait.
+    """
+    get_model()
+    get_alignment_table()
+
+
+def __getattr__(name):
+    if name == "model":
+        return get_model()
+    if name == "alignment_table":
+        return get_alignment_table()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+if __name__ == "__main__":
+    warm_up()
+    model = get_model()
+    alignment_table = get_alignment_table()
@@ -1,30 +1,93 @@
-from typing import Union
-from itertools import takewhile, accumulate
-from math import modf
+"""
+Mapping between flat indices into a chunked sequence (e.g. the graphemes of a word)
+and "real" indices counting chunks, where the fractional part is the position inside
+the chunk. Since a word's graphemes and phonemes are chunked the same way, deflating a
+real index into the other sequence maps a position in the spelling to the sound and
+vice versa.
+
+All of them work on the prefix offsets of the matrix, which are computed once per
+matrix - the scalar versions bisect them, the `_many` versions map whole arrays of
+indices at once. The index right after the last element maps to the one right after
+the last chunk, so the ends of slices can be mapped too. Indices out of that range
+raise an `IndexError`.
+"""
+from typing import List, Sequence, Union
+from itertools import accumulate
+from bisect import bisect_right
 from fractions import Fraction
+import numpy as np
+
 
+def prefix_offsets(matrix) -> List[int]:
+    """
+    The flat index at which every chunk starts, followed by the total length.
+    """
+    return list(accumulate(map(len, matrix), initial=0))
 
-def idx_inflate(matrix, flat_index: Union[Fraction, int]):
-    iterator_matrix = iter(matrix)
-    scan = list(
-        takewhile(
-            lambda accumulated_elements: accumulated_elements <= flat_index,
-            accumulate(
-                iterator_matrix,
-                lambda accumulated_elements, new_elements: accumulated_elements
-                + len(new_elements),
-                initial=0,
-            ),
+
+def _check_range(kind: str, indices: np.ndarray, end) -> None:
+    if indices.size and (indices.min() < 0 or indices.max() > end):
+        raise IndexError(
+            "{} index {} out of range [0, {}]".format(
+                kind, indices.min() if indices.min() < 0 else indices.max(), end
+            )
         )
-    )
-    return (Fraction(flat_index) - scan[-1]) / len(matrix[len(scan) - 1]) + (
-        len(scan) - 1
-    )
 
 
-def idx_deflate(matrix, real_index: Fraction):
+def idx_inflate(matrix, flat_index: Union[Fraction, int], offsets=None) -> Fraction:
+    if offsets is None:
+        offsets = prefix_offsets(matrix)
+    if not 0 <= flat_index <= offsets[-1]:
+        raise IndexError(
+            "Flat index {} out of range [0, {}]".format(flat_index, offsets[-1])
+        )
+    chunk = bisect_right(offsets, flat_index) - 1
+    if chunk == len(matrix):
+        return Fraction(chunk)
+    return (Fraction(flat_index) - offsets[chunk]) / len(matrix[chunk]) + chunk
+
+
+def idx_deflate(matrix, real_index: Fraction, offsets=None) -> Fraction:
+    if offsets is None:
+        offsets = prefix_offsets(matrix)
+    if not 0 <= real_index <= len(matrix):
+        raise IndexError(
+            "Real index {} out of range [0, {}]".format(real_index, len(matrix))
+        )
     whole_index = int(real_index)
+    if whole_index == len(matrix):
+        return Fraction(offsets[whole_index])
     ratio = real_index - whole_index
-    return sum(len(array) for array in matrix[:whole_index]) + ratio * len(
-        matrix[whole_index]
+    return offsets[whole_index] + ratio * len(matrix[whole_index])
+
+
+def idx_inflate_many(offsets: Sequence[int], flat_indices) -> np.ndarray:
+    """
+    `idx_inflate` for an array of flat indices.
+    """
+    offsets = np.asarray(offsets)
+    flat_indices = np.asarray(flat_indices, dtype=float)
+    _check_range("Flat", flat_indices, offsets[-1])
+    chunks = np.searchsorted(offsets, flat_indices, side="right") - 1
+    lengths = np.diff(offsets, append=offsets[-1])
+    at_end = chunks >= len(offsets) - 1
+    chunks = np.minimum(chunks, len(offsets) - 2)
+    return np.where(
+        at_end,
+        len(offsets) - 1,
+        chunks
+        + (flat_indices - offsets[chunks]) / np.where(at_end, 1, lengths[chunks]),
     )
+
+
+def idx_deflate_many(offsets: Sequence[int], real_indices) -> np.ndarray:
+    """
+    `idx_deflate` for an array of real indices.
+    """
+    offsets = np.asarray(offsets)
+    real_indices = np.asarray(real_indices, dtype=float)
+    _check_range("Real", real_indices, len(offsets) - 1)
+    whole_indices = real_indices.astype(int)
+    ratios = real_indices - whole_indices
+    lengths = np.diff(offsets, append=offsets[-1])
+    return offsets[whole_indices] + ratios * lengths[whole_indices]